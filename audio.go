@@ -1,11 +1,13 @@
 package main
 
 import (
+	"bufio"
 	"bytes"
 	"encoding/json"
 	"fmt"
 	"io"
 	"log"
+	"net"
 	"net/http"
 	"os"
 	"os/exec"
@@ -39,8 +41,64 @@ type Segment struct {
 	Text  string  `json:"text"`
 }
 
+// Unix socket of the long running Whisper server (python3 sub.py --serve)
+const whisperSocket = "/tmp/contentfactory-whisper.sock"
+
+// How long to wait for the Whisper server to answer one transcription
+const whisperTimeout = 5 * time.Minute
+
 // TranscribeAudio uses a Python Whisper script to transcribe audio
 func TranscribeAudio(audioFile string) ([]Segment, error) {
+	// Use the running server if there is one so the model doesn't get loaded again
+	out, err := transcribeWithServer(audioFile)
+	if err != nil {
+		log.Printf("Whisper server unavailable (%v), running sub.py directly\n", err)
+		if out, err = transcribeWithScript(audioFile); err != nil {
+			return nil, err
+		}
+	}
+
+	var segments []Segment
+	if err := json.Unmarshal(out, &segments); err != nil {
+		var serverError struct {
+			Error string `json:"error"`
+		}
+		if json.Unmarshal(out, &serverError) == nil && serverError.Error != "" {
+			return nil, fmt.Errorf("whisper failed: %s", serverError.Error)
+		}
+		return nil, fmt.Errorf("failed to parse whisper output: %v", err)
+	}
+
+	return segments, nil
+}
+
+// transcribeWithServer sends the audio path to the Whisper server and returns its JSON reply
+func transcribeWithServer(audioFile string) ([]byte, error) {
+	conn, err := net.Dial("unix", whisperSocket)
+	if err != nil {
+		return nil, err
+	}
+	defer conn.Close()
+
+	// Don't let a hung server block the subtitles forever
+	if err := conn.SetDeadline(time.Now().Add(whisperTimeout)); err != nil {
+		return nil, fmt.Errorf("failed to set whisper server deadline: %v", err)
+	}
+
+	if _, err := fmt.Fprintln(conn, audioFile); err != nil {
+		return nil, fmt.Errorf("failed to send audio path: %v", err)
+	}
+
+	reply, err := bufio.NewReader(conn).ReadBytes('\n')
+	if err != nil {
+		return nil, fmt.Errorf("failed to read whisper reply: %v", err)
+	}
+
+	return reply, nil
+}
+
+// transcribeWithScript runs sub.py as a one off process (loads the model every time)
+func transcribeWithScript(audioFile string) ([]byte, error) {
 	cmd := exec.Command("python3", "sub.py", audioFile)
 	var out bytes.Buffer
 	cmd.Stdout = &out
@@ -50,12 +108,7 @@ func TranscribeAudio(audioFile string) ([]Segment, error) {
 		return nil, fmt.Errorf("failed to run whisper script: %v", err)
 	}
 
-	var segments []Segment
-	if err := json.Unmarshal(out.Bytes(), &segments); err != nil {
-		return nil, fmt.Errorf("failed to parse whisper output: %v", err)
-	}
-
-	return segments, nil
+	return out.Bytes(), nil
 }
 
 // formatDuration converts duration to simplified timestamp format (SS,mmm)
@@ -1,35 +1,168 @@
-from moviepy import VideoFileClip, TextClip, CompositeVideoClip, AudioFileClip, ImageClip, concatenate_videoclips, CompositeAudioClip
+from moviepy import VideoFileClip, CompositeVideoClip, ImageClip, concatenate_videoclips
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io import ffmpeg_reader
+import numpy as np
+import mmap
+import multiprocessing
+import subprocess
+import tempfile
 import sys
 import os
 import random
+import re
+
+# Short form video doesn't need more than 30fps, anything above that is just extra frames to render
+MAX_FPS = 30
+
+# Hardware encoders to try (in order) before falling back to libx264
+HW_ENCODERS = {
+    "h264_nvenc": {
+        "preset": "p4",
+        "ffmpeg_params": ["-tune", "hq", "-rc", "vbr", "-cq", "23", "-b:v", "0", "-pix_fmt", "yuv420p"],
+    },
+    "h264_qsv": {
+        "preset": "veryfast",
+        "ffmpeg_params": ["-global_quality", "23", "-pix_fmt", "nv12"],
+    },
+    "h264_amf": {
+        "preset": "speed",
+        "ffmpeg_params": ["-rc", "cqp", "-qp_i", "23", "-qp_p", "23", "-pix_fmt", "yuv420p"],
+    },
+}
+
+# GeForce drivers limit how many NVENC sessions can run at the same time
+MAX_NVENC_SESSIONS = 3
+
+def select_video_encoder():
+    """
+    Pick the fastest H.264 encoder that actually works on this machine.
+    Returns the codec/preset/ffmpeg_params to pass to write_videofile.
+    """
+    for codec, settings in HW_ENCODERS.items():
+        # Encode a single test frame, ffmpeg lists encoders even when there is no GPU for them
+        probe = [
+            FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=size=256x256", "-frames:v", "1",
+            "-c:v", codec, "-preset", settings["preset"], *settings["ffmpeg_params"],
+            "-f", "null", "-",
+        ]
+        try:
+            if subprocess.run(probe, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+                return {"codec": codec, **settings}
+        except OSError:
+            break
+
+    # veryfast is ~3x faster than x264's default medium preset for a small quality cost
+    return {
+        "codec": "libx264",
+        "preset": "veryfast",
+        "ffmpeg_params": ["-crf", "24", "-x264-params", "rc-lookahead=20:ref=2"],
+    }
+
+class HwDecodeSubprocess:
+    """
+    Stand-in for the subprocess module inside moviepy's ffmpeg reader.
+    Adds NVDEC decoding to the frame pipe command, everything else goes to subprocess as is.
+    """
+    def __getattr__(self, name):
+        return getattr(subprocess, name)
+
+    @staticmethod
+    def Popen(cmd, **kwargs):
+        if "image2pipe" in cmd:
+            # Input options have to come before -ss/-i
+            cmd = [cmd[0], "-hwaccel", "cuda"] + cmd[1:]
+        return subprocess.Popen(cmd, **kwargs)
+
+def hw_decode_available(video_path):
+    """
+    Check that ffmpeg can decode video_path with CUDA on this machine.
+    ffmpeg lists cuda under -hwaccels even without an NVIDIA driver, and an explicit -hwaccel cuda fails instead of falling back.
+    """
+    probe = [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+        "-hwaccel", "cuda", "-i", video_path, "-frames:v", "1",
+        "-f", "null", "-",
+    ]
+    try:
+        return subprocess.run(probe, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+    except OSError:
+        return False
+
+def enable_hw_decode():
+    """Decode VideoFileClip frames on the GPU, only call this after hw_decode_available passed"""
+    ffmpeg_reader.sp = HwDecodeSubprocess()
+
+# ASS script header for the body subtitles, libass burns them in during the encode
+# Alignment 5 = middle center, the side margins keep lines inside a 325px wide box
+SUBTITLE_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 0
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, OutlineColour, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV
+Style: Default,Milker,30,&H00FFFFFF,&H00000000,1,3,0,5,{margin},{margin},0
+
+[Events]
+Format: Layer, Start, End, Style, Text
+"""
+
+def format_ass_time(seconds):
+    """Format seconds as an ASS timestamp (H:MM:SS.cc)"""
+    centiseconds = round(seconds * 100)
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    return f"{hours}:{minutes:02d}:{centiseconds / 100:05.2f}"
+
+def split_subtitles(subtitles):
+    """Turn the subtitle dicts into (starts, ends, texts) so the timing math runs on whole arrays"""
+    starts = np.asarray([sub['start'] for sub in subtitles], dtype=float)
+    ends = np.asarray([sub['end'] for sub in subtitles], dtype=float)
+    texts = [sub['text'] for sub in subtitles]
+    return starts, ends, texts
+
+def write_subtitle_ass(subtitles, file_path, video_size, offset):
+    """Write (starts, ends, texts) subtitles to an ASS file, shifting every subtitle by offset seconds"""
+    starts, ends, texts = subtitles
+    width, height = video_size
+
+    # Shift everything at once and drop the subtitles that end before this part starts
+    starts = np.maximum(starts + offset, 0)
+    ends = ends + offset
+    visible = np.flatnonzero(ends > 0)
+
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(SUBTITLE_HEADER.format(width=width, height=height, margin=max(0, (width - 325) // 2)))
+
+        for index, start, end in zip(visible.tolist(), starts[visible].tolist(), ends[visible].tolist()):
+            # Braces start override tags in ASS
+            text = texts[index].replace('{', '(').replace('}', ')')
+            file.write(f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,{text}\n")
+
+# Subtitle number, time line ("00,000 --> 00,400") and text up to the next blank line
+# Only horizontal whitespace before the line breaks, so a cue with empty text keeps its blank line
+SUBTITLE_PATTERN = re.compile(
+    rb"^[ \t]*(\d+)[ \t]*\r?\n[ \t]*([\d.,]+)[ \t]*-->[ \t]*([\d.,]+)[ \t]*\r?\n(.*?)(?=\r?\n[ \t]*\r?\n|\Z)",
+    re.DOTALL | re.MULTILINE,
+)
 
 def read_subtitle_file(file_path):
-    subtitles = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-        
-    i = 0
-    while i < len(lines):
-        if lines[i].strip().isdigit():  # Subtitle number
-            # Time line format: "00,000 --> 00,400"
-            times = lines[i + 1].strip().split(' --> ')
-            start_time = float(times[0].replace(',', '.'))  # Convert to seconds
-            end_time = float(times[1].replace(',', '.'))
-            
-            # Get text (might be multiple lines)
-            text = ''
-            i += 2
-            while i < len(lines) and lines[i].strip():
-                text += lines[i].strip() + ' '
-                i += 1
-                
-            subtitles.append({
-                'start': start_time,
-                'end': end_time,
-                'text': text.strip()
-            })
-        i += 1
-    return subtitles
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return [
+                {
+                    'start': float(match[2].replace(b',', b'.')),  # Convert to seconds
+                    'end': float(match[3].replace(b',', b'.')),
+                    # Text might be multiple lines
+                    'text': ' '.join(line.strip() for line in match[4].decode('utf-8').splitlines()).strip()
+                }
+                for match in SUBTITLE_PATTERN.finditer(data)
+            ]
 
 # Hide outputs to prevent cluttering terminal
 original_stdout = sys.stdout
@@ -47,126 +180,178 @@ def hideLogs():
     sys.stdout = open(os.devnull, 'w')
     sys.stderr = open(os.devnull, 'w')
 
-hideLogs()
+TITLE_AUDIO = "audio/text-to-speech/post_title.mp3"
+BODY_AUDIO = "audio/text-to-speech/post_body.mp3"
+# TODO: Add more possible clips + soundtracks
+MUSIC = "audio/music/music.mp3"
 
-id = sys.argv[1]
+def mix_audio(part_times, title_duration, output_path):
+    """
+    Mix the voice over and background music for the whole video once with ffmpeg's amix filter.
+    The body voice starts after the title and the music restarts at the beginning of every part.
+    """
+    filters = [
+        "[0]volume=1.5[title]",
+        f"[1]volume=1.5,adelay={title_duration * 1000:.0f}:all=1[body]",
+        "[title][body]amix=inputs=2:duration=longest:normalize=0[voice]",
+        f"[2]volume=0.3,asplit={len(part_times)}" + "".join(f"[music{i}]" for i in range(len(part_times))),
+    ]
+    for i, (start, end) in enumerate(part_times):
+        filters.append(f"[music{i}]atrim=0:{end - start:.3f},asetpts=PTS-STARTPTS,adelay={start * 1000:.0f}:all=1[bg{i}]")
+    filters.append(
+        "[voice]" + "".join(f"[bg{i}]" for i in range(len(part_times)))
+        + f"amix=inputs={len(part_times) + 1}:duration=first:normalize=0[audio]"
+    )
 
-# Load audio
-bodyAudio = AudioFileClip("audio/text-to-speech/post_body.mp3").with_volume_scaled(1.5)
-titleAudio = AudioFileClip("audio/text-to-speech/post_title.mp3").with_volume_scaled(1.5)
+    subprocess.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-i", TITLE_AUDIO, "-i", BODY_AUDIO, "-i", MUSIC,
+        "-filter_complex", ";".join(filters), "-map", "[audio]",
+        "-c:a", "aac", "-b:a", "192k", output_path,
+    ], check=True)
 
-# TODO: Add more possible clips + soundtracks
-# TODO: Figure out where the random temp audio files are coming from
-backgroundMusic = AudioFileClip("audio/music/music.mp3").with_volume_scaled(0.3)
+def split_into_parts(total_duration, max_duration=90, min_duration=30):
+    """
+    Work out the (start, end) of every part up front.
+    A tail shorter than min_duration gets added to the last part instead of being dropped.
+    """
+    full_parts = int(total_duration // max_duration)
+    tail = total_duration - full_parts * max_duration
 
-# Load your video
-gamePlay = VideoFileClip("video/minecraft.mp4").without_audio()
+    part_count = full_parts + 1 if tail >= min_duration or full_parts == 0 else full_parts
+    boundaries = np.arange(part_count + 1) * float(max_duration)
+    boundaries[-1] = total_duration
 
-# Generate a random starting point
-random_start = random.uniform(0, gamePlay.duration - titleAudio.duration - bodyAudio.duration)
+    return list(zip(boundaries[:-1].tolist(), boundaries[1:].tolist()))
 
-# Create subclips with the random starting point
-titleClip = gamePlay.subclipped(random_start, random_start + titleAudio.duration)
-bodyClip = gamePlay.subclipped(random_start + titleAudio.duration, random_start + titleAudio.duration + bodyAudio.duration)
+def build_final_video(random_start, title_duration, body_duration):
+    """
+    Build the full video (gameplay and title card) starting the gameplay at random_start.
+    Subtitles and audio are not part of it, ffmpeg adds them when a part is written.
+    """
+    # Load your video
+    gamePlay = VideoFileClip("video/minecraft.mp4").without_audio()
 
-# Load and configure your image
-title_image_clip = (
-    ImageClip("video/reddit.png")
-    .with_duration(titleAudio.duration)
-    .resized(0.57)
-    .with_position((10, 215))
-)
+    # Create subclips with the random starting point
+    titleClip = gamePlay.subclipped(random_start, random_start + title_duration)
+    bodyClip = gamePlay.subclipped(random_start + title_duration, random_start + title_duration + body_duration)
 
-# Read body subtitles
-body_subtitles = read_subtitle_file("audio/text-to-speech/subtitles.txt")
-
-# TODO: Make some texts different colors to attract attention
-# TODO: Add sound cues afer some key words
-# Create subtitle clips for body
-body_subtitle_clips = []
-for sub in body_subtitles:
-    txt_clip = (TextClip(
-        text=sub['text'],
-        font="fonts/Milker.otf",
-        font_size=30,
-        color='white',
-        stroke_color="black",
-        stroke_width=3,
-        size=(325, 200),
-        method='caption',
-        text_align="center",
-    )
-    .with_duration(sub['end'] - sub['start'])
-    .with_position('center')
-    .with_start(sub['start']))
-    
-    body_subtitle_clips.append(txt_clip)
-
-# Composite video clips
-title_video = CompositeVideoClip([titleClip, title_image_clip]).with_duration(titleAudio.duration)
-body_video = CompositeVideoClip([bodyClip] + body_subtitle_clips).with_duration(bodyAudio.duration)
-
-# Combine video clips
-final_video = concatenate_videoclips([title_video, body_video], method="compose")
-
-# Combine all audio tracks
-# loopedBackgroundMusic = backgroundMusic.loop(duration=final_video.duration)
-final_audio = CompositeAudioClip([
-    titleAudio.with_start(0),
-    bodyAudio.with_start(titleAudio.duration)
-])
-
-final_video = final_video.with_audio(final_audio)
-
-# Split the video into parts if it exceeds max_duration
-video_parts = []
-total_duration = final_video.duration
-start_time = 0
-# TODO: Figure out a better split for the clips (some never release the last part right now)
-max_duration = 90
-
-while start_time < total_duration:
-    end_time = min(start_time + max_duration, total_duration)
-    part = final_video.subclipped(start_time, end_time)
-
-    if part.duration >= 30:
-        video_parts.append(part)
-        
-    start_time = end_time
-
-# Export
-for i, part in enumerate(video_parts):
-    # Get the duration of current video part
-    part_duration = part.duration
-    
-    # Combine audio tracks
-    final_audio = CompositeAudioClip([
-        part.audio,  # Original audio
-        backgroundMusic.subclipped(0, min(part_duration, backgroundMusic.duration))
-    ])
-    
-    # Create new video clip with combined audio
-    final_clip = part.with_audio(final_audio)
-    
-    # TODO: Find a way to hide the long metadata of the clip
-    # Show loading bar
-    showLogs()
-
-    # Write the final video file
-    # TODO: Try to find a way to make this render faster 
-    output_path = os.path.join(f"video/pending/{id}_part_{i + 1}.mp4")
-    final_clip.write_videofile(
-        output_path,
-        codec="libx264",
-        audio_codec="libmp3lame",
-        threads=12
+    # Load and configure your image
+    title_image_clip = (
+        ImageClip("video/reddit.png")
+        .with_duration(title_duration)
+        .with_position((10, 215))
     )
 
-    # Hide loading bar
+    # Composite video clips
+    title_video = CompositeVideoClip([titleClip, title_image_clip]).with_duration(title_duration)
+    body_video = bodyClip.with_duration(body_duration)
+
+    # Combine video clips
+    # Both come from the same gameplay footage (same size) and never overlap, so no compositing is needed
+    return concatenate_videoclips([title_video, body_video], method="chain")
+
+def render_part(args):
+    """
+    Render one part of the video in its own process.
+    Clips don't pickle, so every worker rebuilds the video and only writes its own time range.
+    """
+    id, i, start, end, random_start, title_duration, body_duration, body_subtitles, audio_path, video_encoder, hw_decode, threads = args
+
+    hideLogs()
+    if hw_decode:
+        enable_hw_decode()
+
+    final_clip = build_final_video(random_start, title_duration, body_duration).subclipped(start, end)
+
+    # The body starts after the title so shift the subtitles onto this part's timeline
+    # Relative path next to the outputs, the ass filter treats ':' and '\' in paths as syntax (e.g. Windows temp dirs)
+    subtitle_path = f"video/pending/{id}_part_{i + 1}.ass"
+    video_fd, video_path = tempfile.mkstemp(suffix=".mp4")
+    os.close(video_fd)
+
+    try:
+        write_subtitle_ass(body_subtitles, subtitle_path, final_clip.size, title_duration - start)
+
+        # Write the video without audio
+        encoder = dict(video_encoder)
+        encoder["ffmpeg_params"] = encoder.get("ffmpeg_params", []) + ["-vf", f"ass={subtitle_path}:fontsdir=fonts"]
+
+        final_clip.write_videofile(
+            video_path,
+            fps=min(final_clip.fps, MAX_FPS),
+            audio=False,
+            threads=threads,
+            logger=None,
+            **encoder
+        )
+
+        # Add this part's slice of the mixed audio, both streams are copied as is
+        output_path = os.path.join(f"video/pending/{id}_part_{i + 1}.mp4")
+        subprocess.run([
+            FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-i", video_path,
+            "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", audio_path,
+            "-map", "0:v", "-map", "1:a", "-c", "copy", output_path,
+        ], check=True)
+    finally:
+        # Clean up to free memory, also when the render fails
+        final_clip.close()
+        os.remove(video_path)
+        if os.path.exists(subtitle_path):
+            os.remove(subtitle_path)
+
+    return output_path
+
+if __name__ == "__main__":
     hideLogs()
-    
-    # Clean up to free memory
-    final_clip.close()
-    
-# Clean up background music
-backgroundMusic.close()
+
+    id = sys.argv[1]
+
+    video_encoder = select_video_encoder()
+    # Probe once here so the workers don't each run their own test decode
+    hw_decode = hw_decode_available("video/minecraft.mp4")
+
+    # Only the durations are needed here, probe them without opening decoders
+    # The workers build the actual clips and open the gameplay once each
+    titleDuration = ffmpeg_reader.ffmpeg_parse_infos(TITLE_AUDIO)["duration"]
+    bodyDuration = ffmpeg_reader.ffmpeg_parse_infos(BODY_AUDIO)["duration"]
+    gamePlayDuration = ffmpeg_reader.ffmpeg_parse_infos("video/minecraft.mp4")["duration"]
+
+    # Generate a random starting point
+    random_start = random.uniform(0, gamePlayDuration - titleDuration - bodyDuration)
+
+    # Split the video into parts if it exceeds max_duration
+    part_times = split_into_parts(titleDuration + bodyDuration)
+
+    # Read body subtitles once for all workers
+    # TODO: Make some texts different colors to attract attention
+    # TODO: Add sound cues afer some key words
+    body_subtitles = split_subtitles(read_subtitle_file("audio/text-to-speech/subtitles.txt"))
+
+    # Combine audio tracks once, the workers copy their slice of it
+    audio_fd, audio_path = tempfile.mkstemp(suffix=".m4a")
+    os.close(audio_fd)
+
+    try:
+        mix_audio(part_times, titleDuration, audio_path)
+
+        # Export every part in parallel, each worker runs its own ffmpeg decode/encode
+        processes = max(1, min(len(part_times), (os.cpu_count() or 2) // 2))
+        if video_encoder["codec"] == "h264_nvenc":
+            processes = min(processes, MAX_NVENC_SESSIONS)
+        threads = max(1, 12 // processes)
+        jobs = [
+            (id, i, start, end, random_start, titleDuration, bodyDuration, body_subtitles, audio_path, video_encoder, hw_decode, threads)
+            for i, (start, end) in enumerate(part_times)
+        ]
+
+        # TODO: Find a way to hide the long metadata of the clip
+        showLogs()
+        print(f"Rendering {len(jobs)} part(s) with {processes} worker(s) using {video_encoder['codec']}...")
+
+        with multiprocessing.get_context("spawn").Pool(processes=processes) as pool:
+            for output_path in pool.imap_unordered(render_part, jobs):
+                print(f"Finished {output_path}")
+    finally:
+        os.remove(audio_path)
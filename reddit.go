@@ -6,6 +6,7 @@ import (
 	"log"
 	"os"
 	"os/exec"
+	"strconv"
 	"strings"
 	"sync"
 	"time"
@@ -26,7 +27,6 @@ type RedditConfig struct {
 const (
 	processedPostFile = "video/pending/processedPosts.txt"
 	enviroment        = "private/info.env"
-	embedURL          = "https://publish.reddit.com/embed?url="
 )
 
 func initRedditClient(config RedditConfig) (*reddit.Client, error) {
@@ -131,6 +131,9 @@ func processRedditPosts(client *reddit.Client, azureConfig AzureConfig) (*reddit
 	post := posts[rand.Intn(len(posts))]
 	// TODO: Save the pulled posts that wont be used for later to save API calls
 
+	// Keep the original title for the post image
+	displayTitle := post.Title
+
 	// Replace the AITA to the full form for when you are converting to text-to-speech
 	// TODO: Have some way to fix grammar or define acronyms (M, F, idk, etc..)!
 	if strings.HasPrefix(post.Title, "AITA") {
@@ -152,7 +155,7 @@ func processRedditPosts(client *reddit.Client, azureConfig AzureConfig) (*reddit
 	var wg sync.WaitGroup
 	wg.Add(2)
 	// Get reddit embed (wrap in goroutine later)
-	go getPostImage(post.URL, &wg)
+	go getPostImage(post, displayTitle, &wg)
 
 	// Transcribe audio using Whisper (wrap in go routine later)
 	go getSubtitles(&wg)
@@ -162,11 +165,11 @@ func processRedditPosts(client *reddit.Client, azureConfig AzureConfig) (*reddit
 	return post, nil
 }
 
-func getPostImage(url string, wg *sync.WaitGroup) error {
+func getPostImage(post *reddit.Post, title string, wg *sync.WaitGroup) error {
 	fmt.Println("Grabbing reddit post snapshot....")
 	defer wg.Done()
 
-	cmd := exec.Command("python3", "screenshot.py", embedURL+url)
+	cmd := exec.Command("python3", "screenshot.py", title, post.Author, strconv.Itoa(post.Score), strconv.Itoa(post.NumberOfComments))
 	err := cmd.Run()
 
 	if err != nil {
@@ -1,73 +1,89 @@
-from selenium import webdriver
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from PIL import Image, ImageDraw, ImageFont
 import sys
 
-def setup_driver(geckodriver_path="/usr/local/bin/geckodriver", firefox_path="/usr/bin/firefox"):
-    options = Options()
-    options.add_argument("--headless")
-    options.binary_location = firefox_path
-    
-    service = Service(geckodriver_path)
-    driver = webdriver.Firefox(service=service, options=options)
-    return driver
-
-def wait_for_preloader(driver):
-    WebDriverWait(driver, 10).until(
-        lambda d: d.execute_script(
-            "return window.getComputedStyle(document.getElementById('preloader')).display"
-        ) == "none"
+# Blank reddit embed card (subreddit header, vote/comment footer) that the post gets drawn onto
+TEMPLATE_PATH = "video/reddit_template.png"
+OUTPUT_PATH = "video/reddit.png"
+
+HEADER_HEIGHT = 70  # Subreddit + author line
+FOOTER_TOP = 150  # Upvotes + comments button
+CARD_PADDING = 17
+VIDEO_SCALE = 0.57  # Size the card is shown at in the video, so the editor doesn't resize it every frame
+
+TITLE_FONT = ImageFont.truetype("fonts/Arial.ttf", 24)
+TITLE_LINE_HEIGHT = 28
+SMALL_FONT = ImageFont.truetype("fonts/Arial.ttf", 12)
+
+TITLE_COLOR = (51, 61, 66)
+META_COLOR = (92, 108, 116)
+LINK_COLOR = (217, 57, 0)
+
+def wrap_text(text, font, max_width):
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and font.getlength(candidate) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+def format_count(count):
+    # Same short form reddit uses (1.2k)
+    if count >= 1000:
+        return f"{count / 1000:.1f}k"
+    return str(count)
+
+def render_post(title, author, upvotes, comments):
+    template = Image.open(TEMPLATE_PATH).convert("RGBA")
+    width = template.width
+
+    title_lines = wrap_text(title, TITLE_FONT, width - 2 * CARD_PADDING)
+    title_height = 24 + TITLE_LINE_HEIGHT * len(title_lines)
+
+    # Stretch the empty middle of the template to fit the title
+    header = template.crop((0, 0, width, HEADER_HEIGHT))
+    blank_row = template.crop((0, HEADER_HEIGHT + 5, width, HEADER_HEIGHT + 6))
+    footer = template.crop((0, FOOTER_TOP, width, template.height))
+
+    card = Image.new("RGBA", (width, HEADER_HEIGHT + title_height + footer.height))
+    card.paste(header, (0, 0))
+    card.paste(blank_row.resize((width, title_height)), (0, HEADER_HEIGHT))
+    card.paste(footer, (0, HEADER_HEIGHT + title_height))
+
+    draw = ImageDraw.Draw(card)
+    draw.text((60, 43), f"Posted by {author} ·", font=SMALL_FONT, fill=META_COLOR)
+
+    for i, line in enumerate(title_lines):
+        draw.text((CARD_PADDING, HEADER_HEIGHT + 10 + i * TITLE_LINE_HEIGHT), line, font=TITLE_FONT, fill=TITLE_COLOR)
+
+    footer_top = HEADER_HEIGHT + title_height
+    draw.text((37, footer_top + 9), f"{format_count(upvotes)} upvotes", font=SMALL_FONT, fill=META_COLOR)
+    draw.text(
+        (width / 2, footer_top + 48),
+        f"View {format_count(comments)} comments",
+        font=SMALL_FONT,
+        fill=LINK_COLOR,
+        anchor="mm",
     )
 
+    card = card.resize((int(card.width * VIDEO_SCALE), int(card.height * VIDEO_SCALE)), Image.LANCZOS)
+    card.save(OUTPUT_PATH)
+
 def main():
-    driver = setup_driver()
+    if len(sys.argv) < 5:
+        print("Please provide post title, author, upvotes and comment count")
+        exit()
+
+    title, author = sys.argv[1], sys.argv[2]
     try:
-        # Open the target URL
-        if len(sys.argv) < 2:
-            print("Please provide reddit link")
-            exit()
-
-        url = sys.argv[1]
-        driver.get(url)
-        
-        # Wait for preloader to disappear
-        wait_for_preloader(driver)
-        
-        # Find and click the "Show Customization Options" button
-        wait = WebDriverWait(driver, 10)
-        toggle_button = wait.until(
-            EC.element_to_be_clickable((By.ID, "toggle-options"))
-        )
-        driver.execute_script("arguments[0].scrollIntoView(true);", toggle_button)
-        toggle_button.click()
-        
-        # Wait for the checkbox to be present
-        checkbox = wait.until(
-            EC.presence_of_element_located((By.ID, "hideMedia"))
-        )
-        
-        # Set checked state directly
-        driver.execute_script("arguments[0].click();", checkbox)
-        
-        wait_for_preloader(driver)
-    
-        # Take screenshot
-        driver.set_window_size(1920, 1080)
-        preview_block = wait.until(
-            EC.presence_of_element_located((By.ID, "preview_block"))
-        )
-        preview_block.screenshot("video/reddit.png")
-        
-    except TimeoutException as e:
-        print(f"Timeout waiting for element: {str(e)}")
+        render_post(title, author, int(sys.argv[3]), int(sys.argv[4]))
     except Exception as e:
         print(f"An error occurred: {str(e)}")
-    finally:
-        driver.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
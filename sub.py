@@ -1,88 +1,150 @@
 # sub.py
-import whisper
+from faster_whisper import WhisperModel
+import numpy as np
 import json
 import sys
 import os
+import socket
+import threading
 import warnings
 
+# Unix socket the transcription server (sub.py --serve) listens on
+SOCKET_PATH = "/tmp/contentfactory-whisper.sock"
+# Seconds a server connection may sit idle (no request, unread reply) before it gets closed
+CLIENT_TIMEOUT = 60
+
+PUNCTUATION = np.array(list(".,!?"))
+
 # TODO: Play around with the # of words on the screen at a time since it gets long sometimes
 def split_segment_into_short_segments(segment, max_words=3):
     """
     Split a segment into multiple shorter segments, each with accurate text and timestamps,
     ending early if punctuation like period (.), comma (,), or other symbols are encountered.
     """
-    short_segments = []
-    words = segment.get("words", [])
-    chunk = []
+    words = segment.words or []
+    if not words:
+        return []
 
-    for word in words:
-        # Strip leading and trailing spaces from the word
-        word["word"] = word["word"].strip()
+    # Strip leading and trailing spaces from the words and pull the timestamps into arrays
+    texts = [w.word.strip() for w in words]
+    starts = np.array([w.start for w in words])
+    ends = np.array([w.end for w in words])
+    punctuated = np.isin(np.array([t[-1:] for t in texts]), PUNCTUATION)
 
-        chunk.append(word)
-        if len(chunk) >= max_words or word["word"][-1] in ".,!?":
-            # Clean up trailing punctuation if it's the end of the chunk
-            if word["word"][-1] in ".,!?":
-                word["word"] = word["word"][:-1]
+    # Chunks always end after a punctuated word, and the last word closes any leftover chunk
+    span_ends = np.flatnonzero(punctuated) + 1
+    if span_ends.size == 0 or span_ends[-1] != len(words):
+        span_ends = np.append(span_ends, len(words))
+
+    short_segments = []
+    span_start = 0
+    for span_end in span_ends.tolist():
+        # Between punctuation, cut a new chunk every max_words words
+        for chunk_start in range(span_start, span_end, max_words):
+            chunk_end = min(chunk_start + max_words, span_end)
+            chunk = texts[chunk_start:chunk_end]
 
-            # Create a new short segment
-            start_time = chunk[0]["start"]
-            end_time = chunk[-1]["end"]
+            # Clean up trailing punctuation if it's the end of the chunk
+            if punctuated[chunk_end - 1]:
+                chunk[-1] = chunk[-1][:-1]
 
             # Join words with a single space
-            text = " ".join(w["word"] for w in chunk)
             short_segments.append({
-                "start": start_time,
-                "end": end_time,
-                "text": text
+                "start": float(starts[chunk_start]),
+                "end": float(ends[chunk_end - 1]),
+                "text": " ".join(chunk)
             })
-            chunk = []  # Reset the chunk
-
-    # Handle any remaining words in the chunk
-    if chunk:
-        start_time = chunk[0]["start"]
-        end_time = chunk[-1]["end"]
-        text = " ".join(w["word"] for w in chunk)
-        short_segments.append({
-            "start": start_time,
-            "end": end_time,
-            "text": text
-        })
+        span_start = span_end
 
     return short_segments
 
-def transcribe_audio(audio_file):
+def load_model():
+    return WhisperModel("small", device="cuda", compute_type="float16")  # Use GPU for inference
+
+def transcribe_audio(audio_file, model=None):
+    # Verify file exists
+    if not os.path.exists(audio_file):
+        raise FileNotFoundError(f"Audio file not found: {audio_file}")
+
+    # Load the model (unless a server already has it loaded) and transcribe
+    if model is None:
+        model = load_model()
+    # Clean TTS audio: greedy decoding is enough and VAD skips the silences
+    segments, _ = model.transcribe(
+        audio_file,
+        word_timestamps=True,
+        beam_size=1,
+        best_of=1,
+        temperature=0.0,
+        condition_on_previous_text=False,
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=300),
+    )
+
+    # Split each segment into shorter segments (segments is a generator, decoding happens here)
+    all_short_segments = []
+    for segment in segments:
+        short_segments = split_segment_into_short_segments(segment, max_words=3)
+        all_short_segments.extend(short_segments)
+
+    return all_short_segments
+
+def handle_connection(conn, model, model_lock):
+    """Answer every audio path a client sends (one per line) with one line of JSON"""
+    # Drop clients that go quiet so they don't hold a thread forever
+    conn.settimeout(CLIENT_TIMEOUT)
+
+    # A client going away or timing out mid request (broken pipe, bad bytes) only drops that connection
     try:
-        # Verify file exists
-        if not os.path.exists(audio_file):
-            raise FileNotFoundError(f"Audio file not found: {audio_file}")
+        # Separate read/write streams, a shared "rw" stream drops buffered lines when it writes
+        with conn, conn.makefile("r", encoding="utf-8") as rfile, conn.makefile("w", encoding="utf-8") as wfile:
+            for line in rfile:
+                try:
+                    # One transcription at a time on the GPU
+                    with model_lock:
+                        response = transcribe_audio(line.strip(), model)
+                except Exception as e:
+                    response = {"error": str(e)}
+                wfile.write(json.dumps(response) + "\n")
+                wfile.flush()
+    except (OSError, ValueError):
+        pass
 
-        # Load the model and transcribe
-        model = whisper.load_model("small", device="cuda")  # Use GPU for inference
-        result = model.transcribe(audio_file, word_timestamps=True)
+def serve(socket_path=SOCKET_PATH):
+    """
+    Keep the model loaded and transcribe audio paths sent over a Unix socket.
+    Each connection is served on its own thread, sends one path per line and gets back
+    one line of JSON (segments or {"error": ...}) per path.
+    """
+    model = load_model()
+    model_lock = threading.Lock()
 
-        # Split each segment into shorter segments
-        all_short_segments = []
-        for segment in result["segments"]:
-            short_segments = split_segment_into_short_segments(segment, max_words=3)
-            all_short_segments.extend(short_segments)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
 
-        return all_short_segments
-    except Exception as e:
-        print(json.dumps({"error": str(e)}))
-        sys.exit(1)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(socket_path)
+        server.listen()
+        print(f"Whisper server listening on {socket_path}", flush=True)
+
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle_connection, args=(conn, model, model_lock), daemon=True).start()
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print(json.dumps({"error": "Please provide an audio file path as argument"}))
+        print(json.dumps({"error": "Please provide an audio file path (or --serve) as argument"}))
         sys.exit(1)
 
     warnings.filterwarnings("ignore")
 
     try:
-        audio_file = sys.argv[1]
-        segments = transcribe_audio(audio_file)
-        print(json.dumps(segments, indent=2))
+        if sys.argv[1] == "--serve":
+            serve()
+        else:
+            audio_file = sys.argv[1]
+            segments = transcribe_audio(audio_file)
+            print(json.dumps(segments, indent=2))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)